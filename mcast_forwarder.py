@@ -1,5 +1,8 @@
+import argparse
 import socket
 import struct
+import threading
+import time
 
 # Multicast group and port to listen on.
 MCAST_GRP = '224.1.1.1'
@@ -9,11 +12,49 @@ MCAST_PORT = 6666
 DEST_HOST = 'home.viljo.se'
 DEST_PORT = 6666
 
+# Kernel socket buffer sizes, to ride out bursts without dropping packets.
+# Linux caps them at net.core.rmem_max / net.core.wmem_max; raise those with
+# sysctl to get the full size.
+RCVBUF = 16 * 1024 * 1024
+SNDBUF = 4 * 1024 * 1024
+
+# How often to re-resolve DEST_HOST, in seconds, in case its address changes.
+RESOLVE_INTERVAL = 300
+
+def resolve_dest():
+    """Resolve DEST_HOST:DEST_PORT to a numeric IPv4 sockaddr tuple."""
+    return socket.getaddrinfo(DEST_HOST, DEST_PORT, socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+
+def re_resolver(send_sock, dest):
+    """Periodically re-resolve DEST_HOST and reconnect send_sock if it moved."""
+    while True:
+        time.sleep(RESOLVE_INTERVAL)
+        try:
+            new_dest = resolve_dest()
+            if new_dest == dest:
+                continue
+            print(f"{DEST_HOST} moved from {dest[0]} to {new_dest[0]}")
+            send_sock.connect(new_dest)
+        except OSError as e:
+            # Keep sending to the old address; retry on the next interval.
+            print(f"Error re-resolving {DEST_HOST}: {e}")
+            continue
+        dest = new_dest
+
 def main():
+    parser = argparse.ArgumentParser(
+        description=f"Forward multicast UDP packets from {MCAST_GRP}:{MCAST_PORT} to {DEST_HOST}:{DEST_PORT}."
+    )
+    parser.add_argument("--verbose", "-v", action="store_true",
+                        help="Print a line for every forwarded packet")
+    args = parser.parse_args()
+    verbose = args.verbose
+
     # Create a UDP socket for receiving multicast messages.
     recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
     recv_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    
+    recv_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF)
+
     # Bind to all interfaces on the specified multicast port.
     recv_sock.bind(('', MCAST_PORT))
     
@@ -22,18 +63,39 @@ def main():
     mreq = struct.pack("4sL", socket.inet_aton(MCAST_GRP), socket.INADDR_ANY)
     recv_sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
 
-    # Create a UDP socket for sending packets.
+    # Create a UDP socket for sending packets. Resolve the destination once
+    # and connect to it, so sending needs no per-packet address lookup.
     send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    send_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SNDBUF)
+    while True:
+        try:
+            dest = resolve_dest()
+            break
+        except OSError as e:
+            print(f"Error resolving {DEST_HOST}: {e}")
+            time.sleep(5)
+    send_sock.connect(dest)
+    threading.Thread(target=re_resolver, args=(send_sock, dest), daemon=True).start()
+
+    # Receive into one preallocated buffer and forward a view of it, instead
+    # of allocating a new bytes object for every packet.
+    buf = bytearray(65535)
+    view = memoryview(buf)
 
     print(f"Listening for multicast packets on {MCAST_GRP}:{MCAST_PORT}")
     while True:
         try:
             # Receive packet data.
-            data, addr = recv_sock.recvfrom(65535)
-            #print(f"Received {len(data)} bytes from {addr}. Forwarding to {DEST_HOST}:{DEST_PORT}")
-            
+            nbytes, addr = recv_sock.recvfrom_into(buf)
+            if verbose:
+                print(f"Received {nbytes} bytes from {addr}. Forwarding to {DEST_HOST}:{DEST_PORT}")
+
             # Forward the received packet to the destination.
-            send_sock.sendto(data, (DEST_HOST, DEST_PORT))
+            send_sock.send(view[:nbytes])
+        except ConnectionRefusedError:
+            # ICMP port unreachable from an earlier packet, reported because
+            # the socket is connected. Nothing is listening; keep forwarding.
+            pass
         except KeyboardInterrupt:
             print("Interrupted by user, exiting.")
             break
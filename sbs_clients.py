@@ -0,0 +1,148 @@
+"""
+TCP output of SBS lines to clients for the udp_json_to_sbs*.py servers.
+
+tcp_server accepts clients, broadcast queues a payload for all of them, and
+client_writer sends the queued output from a single thread as the
+non-blocking client sockets become writable.
+"""
+import selectors
+import socket
+import threading
+import time
+
+# Connected TCP clients, keyed by socket fd, and a lock for thread-safe access.
+# Sockets are non-blocking: broadcast() only appends to each client's output
+# buffer and client_writer() sends it, so a slow client never stalls the
+# others or the UDP ingest.
+clients = {}
+clients_lock = threading.Lock()
+# Clients removed from `clients` that client_writer() still has to close.
+dropped_clients = []
+# Written to by broadcast() to wake client_writer() when output is queued.
+wakeup_recv, wakeup_send = socket.socketpair()
+wakeup_send.setblocking(False)
+# Clients whose pending output exceeds this many bytes are disconnected.
+MAX_CLIENT_BUFFER = 4 * 1024 * 1024
+
+class ClientState:
+    """A connected TCP client and its pending output."""
+    __slots__ = ("sock", "addr", "fd", "buf")
+
+    def __init__(self, sock, addr):
+        self.sock = sock
+        self.addr = addr
+        self.fd = sock.fileno()
+        self.buf = bytearray()
+
+def broadcast(payload, quiet):
+    """
+    Queue the given payload (bytes, or a str to encode) for all connected
+    TCP clients. Clients that have fallen too far behind are disconnected.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    wake = False
+    dead = []
+    with clients_lock:
+        for client in clients.values():
+            if len(client.buf) + len(payload) > MAX_CLIENT_BUFFER:
+                dead.append(client)
+                continue
+            if not client.buf:
+                wake = True
+            client.buf += payload
+        # Unregister laggards after the pass (no copy of the registry per
+        # call); client_writer() closes them outside the lock.
+        for client in dead:
+            del clients[client.fd]
+        if dead:
+            dropped_clients.extend(dead)
+            wake = True
+    if not quiet:
+        for client in dead:
+            print(f"Removing client {client.addr}: output buffer full")
+    if wake:
+        try:
+            wakeup_send.send(b"\0")
+        except BlockingIOError:
+            pass  # A wakeup is already pending.
+
+def client_writer(quiet):
+    """
+    Send queued output to TCP clients as their sockets become writable.
+    A client is registered for EVENT_WRITE only while it has pending output.
+    """
+    sel = selectors.DefaultSelector()
+    sel.register(wakeup_recv, selectors.EVENT_READ)
+    registered = set()
+
+    def close_client(client):
+        if client in registered:
+            sel.unregister(client.sock)
+            registered.discard(client)
+        try:
+            client.sock.close()
+        except OSError:
+            pass
+
+    while True:
+        with clients_lock:
+            dropped = dropped_clients[:]
+            dropped_clients.clear()
+            pending = [c for c in clients.values() if c.buf and c not in registered]
+        for client in dropped:
+            close_client(client)
+        for client in pending:
+            sel.register(client.sock, selectors.EVENT_WRITE, client)
+            registered.add(client)
+
+        for key, _ in sel.select(timeout=0.05):
+            if key.fileobj is wakeup_recv:
+                wakeup_recv.recv(4096)
+                continue
+            client = key.data
+            with clients_lock:
+                try:
+                    sent = client.sock.send(client.buf)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError as e:
+                    if not quiet:
+                        print(f"Removing client {client.addr} due to error: {e}")
+                    clients.pop(client.fd, None)
+                    sent = None
+                else:
+                    # Cheap: CPython drops bytes from the front of a
+                    # bytearray by moving its start, without a copy.
+                    del client.buf[:sent]
+                    done = not client.buf
+            if sent is None:
+                close_client(client)
+            elif done:
+                sel.unregister(client.sock)
+                registered.discard(client)
+
+def tcp_server(listen_host, listen_port, quiet):
+    """
+    Start a TCP server that listens on the specified host and port.
+    Accept incoming client connections and add them to the global client list.
+    """
+    server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server_sock.bind((listen_host, listen_port))
+    server_sock.listen(5)
+    if not quiet:
+        print(f"TCP server listening on {listen_host or '0.0.0.0'}:{listen_port}")
+    while True:
+        try:
+            client_sock, client_addr = server_sock.accept()
+            client_sock.setblocking(False)
+            client = ClientState(client_sock, client_addr)
+            with clients_lock:
+                clients[client.fd] = client
+            if not quiet:
+                print(f"New client connected from {client_addr}")
+        except Exception as e:
+            if not quiet:
+                print(f"Error accepting client connection: {e}")
+            time.sleep(1)
@@ -1,13 +1,93 @@
 #!/usr/bin/env python3
 import argparse
-import json
-import socket
 import threading
 import time
 
-# Global list of TCP client sockets and a lock for thread-safe access.
-clients = []
-clients_lock = threading.Lock()
+from sbs_clients import broadcast, client_writer, tcp_server
+from udp_recv import BatchReceiver, open_udp_listener
+
+# NumPy is optional; it is only used to vectorize the numeric columns of
+# packets with many aircraft.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Prefer orjson for decoding UDP datagrams; fall back to the stdlib parser.
+# orjson parses a memoryview of the receive buffer in place; the stdlib
+# parser needs a bytes copy of it.
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+    def json_loads(data):
+        return _json_loads(bytes(data))
+
+# Unit conversion factors.
+MM_TO_FT = 0.00328084       # millimeters to feet
+MPS_TO_KNOTS = 1.94384      # m/s to knots
+MPS_TO_FPM = 196.850394     # m/s to ft/min
+
+# Packets with at least this many aircraft have their numeric columns
+# converted with NumPy; below it the per-record path is faster. Formatting
+# the strings is still per record, so the gain stays modest either way.
+VECTORIZE_MIN_AIRCRAFT = 100
+
+def _scaled_field(value, name, divisor, factor, quiet):
+    """
+    Slow path for a numeric field the inline conversion rejected: return
+    round(float(value) / divisor * factor) as an SBS integer string, or ""
+    if the field is missing or is not a finite number.
+    """
+    if value is None:
+        return ""
+    try:
+        return str(round(float(value) / divisor * factor))
+    except Exception as e:
+        if not quiet:
+            print(f"Error converting {name}: {e}")
+        return ""
+
+def parse_timestamp(ts, quiet=False):
+    """
+    Split an ISO8601 "timeStamp" value into SBS (date, time) strings,
+    "YYYY/MM/DD" and "HH:MM:SS". Returns empty strings if it can't be parsed.
+    """
+    if not ts:
+        return "", ""
+    # Expect format like "YYYY-MM-DDTHH:MM:SSZ" or similar.
+    try:
+        if len(ts) >= 19 and ts[10] == "T":
+            # Common case: slice out the fields directly.
+            return ts[:10].replace("-", "/"), ts[11:19]
+        date_part, time_part = ts.split("T")
+        # Convert date to "YYYY/MM/DD"; remove trailing 'Z' if present and
+        # take HH:MM:SS.
+        return date_part.replace("-", "/"), time_part.rstrip("Z")[:8]
+    except Exception as e:
+        if not quiet:
+            print(f"Error parsing timeStamp '{ts}': {e}")
+        return "", ""
+
+def _sbs_line(ac, altitude_ft, ground_speed, track, vertical_rate, quiet):
+    """
+    Build the SBS CSV line for aircraft record ac, given its numeric fields
+    already converted to strings. Shared by the per-record and vectorized
+    paths, so both always emit the same fields.
+    """
+    date_generated, time_generated = parse_timestamp(ac.get("timeStamp", ""), quiet)
+    hex_ident = ac.get("icaoAddress", "").upper()
+    callsign = ac.get("callsign", "").strip()
+    # Latitude and Longitude as-is.
+    latitude = str(ac.get("latDD", ""))
+    longitude = str(ac.get("lonDD", ""))
+    squawk = str(ac.get("squawk", ""))
+    # Fields: MSG,3,,,(hex_ident),,date_generated,time_generated,date_generated,time_generated,callsign,alt_ft,gs,track,lat,lon,vr,squawk,0,0,0,0
+    return (f"MSG,3,,,{hex_ident},,{date_generated},{time_generated},"
+            f"{date_generated},{time_generated},{callsign},{altitude_ft},"
+            f"{ground_speed},{track},{latitude},{longitude},{vertical_rate},"
+            f"{squawk},0,0,0,0")
 
 def convert_aircraft_to_sbs(ac, quiet=False):
     """
@@ -39,98 +119,38 @@ def convert_aircraft_to_sbs(ac, quiet=False):
      
     Returns the SBS message line as a string.
     """
-    # Helper: get time/date from the "timeStamp" field (ISO8601 format)
-    date_generated = ""
-    time_generated = ""
-    ts = ac.get("timeStamp", "")
-    if ts:
-        # Expect format like "YYYY-MM-DDTHH:MM:SSZ" or similar.
-        try:
-            date_part, time_part = ts.split("T")
-            # Convert date to "YYYY/MM/DD"
-            date_generated = date_part.replace("-", "/")
-            # Remove trailing 'Z' if present and take HH:MM:SS
-            time_generated = time_part.rstrip("Z")[:8]
-        except Exception as e:
-            if not quiet:
-                print(f"Error parsing timeStamp '{ts}': {e}")
+    # Numeric fields are converted inline; anything that raises (missing,
+    # a string, NaN, infinity, out of range) goes to _scaled_field().
 
-    hex_ident = ac.get("icaoAddress", "").upper()
-    callsign = ac.get("callsign", "").strip()
-    
     # Convert altitude from millimeters to feet.
-    altitude_ft = ""
-    if "altitudeMM" in ac:
-        try:
-            altitude_ft = str(int(round(float(ac["altitudeMM"]) * 0.00328084)))
-        except Exception as e:
-            if not quiet:
-                print(f"Error converting altitudeMM: {e}")
-    
+    v = ac.get("altitudeMM")
+    try:
+        altitude_ft = str(round(v * MM_TO_FT))
+    except Exception:
+        altitude_ft = _scaled_field(v, "altitudeMM", 1.0, MM_TO_FT, quiet)
+
     # Convert ground speed: horVelocityCMS (cm/s) to m/s then to knots.
-    ground_speed = ""
-    if "horVelocityCMS" in ac:
-        try:
-            # horVelocityCMS in cm/s -> m/s
-            mps = float(ac["horVelocityCMS"]) / 100.0
-            # 1 m/s ~ 1.94384 knots
-            ground_speed = str(int(round(mps * 1.94384)))
-        except Exception as e:
-            if not quiet:
-                print(f"Error converting horVelocityCMS: {e}")
+    v = ac.get("horVelocityCMS")
+    try:
+        ground_speed = str(round(v / 100.0 * MPS_TO_KNOTS))
+    except Exception:
+        ground_speed = _scaled_field(v, "horVelocityCMS", 100.0, MPS_TO_KNOTS, quiet)
 
     # Heading: from headingDE2 (centi-deg) to degrees.
-    track = ""
-    if "headingDE2" in ac:
-        try:
-            track = str(int(round(float(ac["headingDE2"]) / 100.0)))
-        except Exception as e:
-            if not quiet:
-                print(f"Error converting headingDE2: {e}")
+    v = ac.get("headingDE2")
+    try:
+        track = str(round(v / 100.0))
+    except Exception:
+        track = _scaled_field(v, "headingDE2", 100.0, 1.0, quiet)
 
-    # Latitude and Longitude as-is.
-    latitude = str(ac.get("latDD", ""))
-    longitude = str(ac.get("lonDD", ""))
-    
-    # Vertical rate: from verVelocityCMS (cm/s) to ft/min.
-    vertical_rate = ""
-    if "verVelocityCMS" in ac:
-        try:
-            # Convert cm/s to m/s then to ft/min: 1 m/s = 196.850394 ft/min.
-            vertical_rate = str(int(round((float(ac["verVelocityCMS"]) / 100.0) * 196.850394)))
-        except Exception as e:
-            if not quiet:
-                print(f"Error converting verVelocityCMS: {e}")
-    
-    squawk = str(ac.get("squawk", ""))
-    
-    # Build the SBS CSV line.
-    # Fields: MSG,3,,,(hex_ident),,date_generated,time_generated,date_generated,time_generated,callsign,alt_ft,gs,track,lat,lon,vr,squawk,0,0,0,0
-    fields = [
-        "MSG",
-        "3",        # Transmission type: using "3" for airborne position
-        "",         # Session ID
-        "",         # Aircraft ID
-        hex_ident,
-        "",         # Flight ID
-        date_generated,
-        time_generated,
-        date_generated,
-        time_generated,
-        callsign,
-        altitude_ft,
-        ground_speed,
-        track,
-        latitude,
-        longitude,
-        vertical_rate,
-        squawk,
-        "0",        # Alert
-        "0",        # Emergency
-        "0",        # SPI
-        "0"         # OnGround
-    ]
-    return ",".join(fields)
+    # Vertical rate: from verVelocityCMS (cm/s) to m/s then to ft/min.
+    v = ac.get("verVelocityCMS")
+    try:
+        vertical_rate = str(round(v / 100.0 * MPS_TO_FPM))
+    except Exception:
+        vertical_rate = _scaled_field(v, "verVelocityCMS", 100.0, MPS_TO_FPM, quiet)
+
+    return _sbs_line(ac, altitude_ft, ground_speed, track, vertical_rate, quiet)
 
 def convert_json_to_sbs(json_data, quiet=False):
     """
@@ -143,79 +163,88 @@ def convert_json_to_sbs(json_data, quiet=False):
             print("Received JSON does not contain an 'aircraft' field.")
         return sbs_lines
 
-    for ac in json_data["aircraft"]:
+    aircraft = json_data["aircraft"]
+    if np is not None and len(aircraft) >= VECTORIZE_MIN_AIRCRAFT:
+        vectorized = convert_aircraft_list_to_sbs(aircraft, quiet)
+        if vectorized is not None:
+            return vectorized
+
+    for ac in aircraft:
         sbs_line = convert_aircraft_to_sbs(ac, quiet)
         if sbs_line:
             sbs_lines.append(sbs_line)
     return sbs_lines
 
+def _scaled_column(aircraft, key, divisor, factor):
+    """
+    Convert the numeric field key of every aircraft to a list of SBS integer
+    strings, computing round(value / divisor * factor) in one NumPy pass.
+    Missing or non-finite values become "". Returns None if a value has an
+    unexpected type, so the caller can fall back to the per-record path.
+    """
+    try:
+        values = np.fromiter((ac.get(key, np.nan) for ac in aircraft),
+                             dtype=np.float64, count=len(aircraft))
+    except (TypeError, ValueError, OverflowError):
+        return None
+    rounded = np.round(values / divisor * factor)
+    valid = np.isfinite(rounded)
+    if not np.all(np.abs(rounded[valid]) < 2.0 ** 62):
+        return None
+    ints = np.where(valid, rounded, 0).astype(np.int64).tolist()
+    return [str(i) if ok else "" for i, ok in zip(ints, valid.tolist())]
+
+def convert_aircraft_list_to_sbs(aircraft, quiet=False):
+    """
+    Vectorized equivalent of convert_aircraft_to_sbs over a whole list of
+    aircraft records. The numeric unit conversions are done column-wise with
+    NumPy; the string fields are still handled per record. Returns None if a
+    numeric field has an unexpected type.
+    """
+    altitude_ft = _scaled_column(aircraft, "altitudeMM", 1.0, MM_TO_FT)
+    ground_speed = _scaled_column(aircraft, "horVelocityCMS", 100.0, MPS_TO_KNOTS)
+    track = _scaled_column(aircraft, "headingDE2", 100.0, 1.0)
+    vertical_rate = _scaled_column(aircraft, "verVelocityCMS", 100.0, MPS_TO_FPM)
+    if altitude_ft is None or ground_speed is None or track is None or vertical_rate is None:
+        return None
+
+    return [_sbs_line(ac, alt, gs, trk, vr, quiet)
+            for ac, alt, gs, trk, vr in zip(aircraft, altitude_ft, ground_speed,
+                                            track, vertical_rate)]
+
 def udp_listener(udp_port, quiet):
     """
     Listen for incoming UDP JSON messages on the specified port.
     Convert them to SBS formatted lines and broadcast to all connected TCP clients.
     """
-    udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    udp_sock.bind(("", udp_port))
+    udp_sock = open_udp_listener(udp_port, quiet)
+    # Datagrams are received in batches into preallocated buffers and parsed
+    # from views of them, instead of one syscall and bytes object per packet.
+    receiver = BatchReceiver(udp_sock)
     if not quiet:
         print(f"UDP listener started on port {udp_port}")
 
     while True:
         try:
-            data, addr = udp_sock.recvfrom(65535)
-            if not quiet:
-                print(f"Received UDP packet from {addr}")
-            json_str = data.decode("utf-8")
-            json_data = json.loads(json_str)
-            sbs_lines = convert_json_to_sbs(json_data, quiet)
-            # For each SBS message line, broadcast (append newline)
-            for line in sbs_lines:
-                broadcast(line + "\n", quiet)
+            packets = receiver.recv()
         except Exception as e:
             if not quiet:
                 print(f"Error in UDP listener: {e}")
-
-def broadcast(message, quiet):
-    """
-    Send the given message (a string) to all connected TCP clients.
-    Remove clients that are disconnected.
-    """
-    global clients
-    with clients_lock:
-        for client in clients[:]:
+            time.sleep(1)
+            continue
+        for data, addr in packets:
             try:
-                client.sendall(message.encode("utf-8"))
+                if not quiet:
+                    print(f"Received UDP packet from {addr}")
+                json_data = json_loads(data)
+                sbs_lines = convert_json_to_sbs(json_data, quiet)
+                # Broadcast all SBS lines of the packet in a single send per client.
+                if sbs_lines:
+                    payload = ("\n".join(sbs_lines) + "\n").encode("utf-8")
+                    broadcast(payload, quiet)
             except Exception as e:
                 if not quiet:
-                    print(f"Removing client due to error: {e}")
-                clients.remove(client)
-                try:
-                    client.close()
-                except:
-                    pass
-
-def tcp_server(listen_host, listen_port, quiet):
-    """
-    Start a TCP server that listens on the specified host and port.
-    Accept incoming client connections and add them to the global client list.
-    """
-    server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server_sock.bind((listen_host, listen_port))
-    server_sock.listen(5)
-    if not quiet:
-        print(f"TCP server listening on {listen_host}:{listen_port}")
-
-    while True:
-        try:
-            client_sock, client_addr = server_sock.accept()
-            with clients_lock:
-                clients.append(client_sock)
-            if not quiet:
-                print(f"New client connected from {client_addr}")
-        except Exception as e:
-            if not quiet:
-                print(f"Error accepting client connection: {e}")
-            time.sleep(1)
+                    print(f"Error in UDP listener: {e}")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -236,6 +265,10 @@ def main():
     udp_thread = threading.Thread(target=udp_listener, args=(args.udp_port, quiet), daemon=True)
     udp_thread.start()
 
+    # Start the TCP client writer thread.
+    writer_thread = threading.Thread(target=client_writer, args=(quiet,), daemon=True)
+    writer_thread.start()
+
     # Start TCP server (in main thread or separate thread).
     tcp_server(args.listen_host, args.tcp_port, quiet)
 
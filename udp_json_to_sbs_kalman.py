@@ -1,121 +1,217 @@
 #!/usr/bin/env python3
 import argparse
-import json
 import math
-import socket
+import multiprocessing
 import threading
 import time
 import numpy as np
+from multiprocessing.connection import wait
 
-# Global dictionaries for aircraft filters and TCP clients.
-filters = {}  # Key: icaoAddress, Value: KalmanFilterLocal instance
-filters_lock = threading.Lock()
+from sbs_clients import broadcast, client_writer, tcp_server
+from udp_recv import BatchReceiver, open_udp_listener
+
+# Prefer orjson for decoding UDP datagrams; fall back to the stdlib parser.
+# orjson parses a memoryview of the receive buffer in place; the stdlib
+# parser needs a bytes copy of it.
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+    def json_loads(data):
+        return _json_loads(bytes(data))
 
-clients = []
-clients_lock = threading.Lock()
+# Compiled kernels are optional; fall back to the NumPy batch path without numba.
+try:
+    import kalman_nb
+except ImportError:
+    kalman_nb = None
+
+# Global dictionary of aircraft filters (icao -> KalmanFilterLocal view).
+filters = {}
+filters_lock = threading.Lock()
 
 # ---------------------------
-# Coordinate conversion functions
+# Filter store (Structure-of-Arrays)
 # ---------------------------
-def latlon_to_xy(lat, lon, ref_lat, ref_lon):
-    """Convert lat,lon (in degrees) to local x,y in meters using an equirectangular approximation."""
-    # Approximate meters per degree at the reference latitude.
-    rad = math.radians(ref_lat)
-    m_per_deg_lon = 111320 * math.cos(rad)
-    m_per_deg_lat = 110574
-    x = (lon - ref_lon) * m_per_deg_lon
-    y = (lat - ref_lat) * m_per_deg_lat
-    return x, y
-
-def xy_to_latlon(x, y, ref_lat, ref_lon):
-    """Convert local x,y in meters back to lat,lon using the same approximation."""
-    rad = math.radians(ref_lat)
-    m_per_deg_lon = 111320 * math.cos(rad)
-    m_per_deg_lat = 110574
-    lat = y / m_per_deg_lat + ref_lat
-    lon = x / m_per_deg_lon + ref_lon
-    return lat, lon
+# All filter state lives in contiguous float64 arrays, one row per aircraft,
+# so predict/update run as a single NumPy call over the whole fleet instead
+# of one small-matrix call per aircraft. Rows 0..n-1 are in use, where n is
+# len(rows); rows[i] is the KalmanFilterLocal view that owns row i.
+CAP = 256
+STATE = np.zeros((CAP, 6))       # [x, y, alt, vx, vy, v_alt]
+P = np.zeros((CAP, 6, 6))        # state covariance
+REF = np.zeros((CAP, 2))         # reference [lat, lon] for local coordinates
+LAST_T = np.zeros(CAP)           # time of last predict/update
+LAST_MEAS = np.zeros(CAP)        # time of last measurement
+rows = []
+
+# Aircraft without a measurement for OUTPUT_TIMEOUT seconds are no longer
+# reported (out of range); after FILTER_TIMEOUT seconds their filter is
+# dropped, so the store only holds the currently tracked fleet.
+OUTPUT_TIMEOUT = 10.0
+FILTER_TIMEOUT = 60.0
+
+# Initial covariance, process noise and measurement noise (tune as needed).
+P0 = np.eye(6) * 100.0
+Q = np.eye(6) * 0.1
+R = np.eye(3) * 10.0
 
 # ---------------------------
-# Kalman Filter Class for Local Coordinates
+# Kalman Filter (batched over the filter store)
 # ---------------------------
 class KalmanFilterLocal:
-    def __init__(self, lat, lon, alt_m, vx, vy, v_alt, icao, callsign, squawk):
-        # Use the first measurement as the reference for local coordinates.
-        self.ref_lat = lat
-        self.ref_lon = lon
+    """Thin view onto one row of the filter store, plus per-aircraft metadata."""
+    __slots__ = ("row", "icao", "callsign", "squawk", "_mlon", "_mlat")
+
+    def __init__(self, row, icao, callsign, squawk, ref_lat):
+        self.row = row
         self.icao = icao
         self.callsign = callsign
         self.squawk = squawk
+        # Meters per degree at the reference latitude (equirectangular
+        # approximation). The reference never changes, so compute them once:
+        #   x = (lon - ref_lon) * _mlon,  y = (lat - ref_lat) * _mlat
+        self._mlon = 111320.0 * math.cos(math.radians(ref_lat))
+        self._mlat = 110574.0
+
+    @property
+    def state(self):
+        return STATE[self.row]
+
+    @property
+    def P(self):
+        return P[self.row]
+
+    @property
+    def ref_lat(self):
+        return REF[self.row, 0]
+
+    @property
+    def ref_lon(self):
+        return REF[self.row, 1]
+
+    @property
+    def last_time(self):
+        return LAST_T[self.row]
+
+    @property
+    def last_measurement_time(self):
+        return LAST_MEAS[self.row]
+
+def _grow():
+    """Double the capacity of the filter store."""
+    global CAP, STATE, P, REF, LAST_T, LAST_MEAS
+    CAP *= 2
+    STATE = np.concatenate([STATE, np.zeros_like(STATE)])
+    P = np.concatenate([P, np.zeros_like(P)])
+    REF = np.concatenate([REF, np.zeros_like(REF)])
+    LAST_T = np.concatenate([LAST_T, np.zeros_like(LAST_T)])
+    LAST_MEAS = np.concatenate([LAST_MEAS, np.zeros_like(LAST_MEAS)])
+
+def add_filter(lat, lon, alt_m, vx, vy, v_alt, icao, callsign, squawk, current_time):
+    """Allocate a row for a new aircraft, using the first measurement as reference."""
+    row = len(rows)
+    if row == CAP:
+        _grow()
+    # The reference point is the first measurement, so x = y = 0.
+    STATE[row] = (0.0, 0.0, alt_m, vx, vy, v_alt)
+    P[row] = P0
+    REF[row] = (lat, lon)
+    LAST_T[row] = current_time
+    LAST_MEAS[row] = current_time
+    kf = KalmanFilterLocal(row, icao, callsign, squawk, lat)
+    rows.append(kf)
+    return kf
+
+def remove_row(row):
+    """Free a row by moving the last row into it. Returns the removed view."""
+    kf = rows[row]
+    last = len(rows) - 1
+    if row != last:
+        STATE[row] = STATE[last]
+        P[row] = P[last]
+        REF[row] = REF[last]
+        LAST_T[row] = LAST_T[last]
+        LAST_MEAS[row] = LAST_MEAS[last]
+        moved = rows[last]
+        moved.row = row
+        rows[row] = moved
+    rows.pop()
+    return kf
 
-        x, y = latlon_to_xy(lat, lon, self.ref_lat, self.ref_lon)
-        self.alt = alt_m  # altitude in meters
-
-        # State vector: [x, y, alt, vx, vy, v_alt]
-        self.state = np.array([x, y, self.alt, vx, vy, v_alt]).reshape(6, 1)
-        # Initial covariance (tuned arbitrarily)
-        self.P = np.eye(6) * 100.0
-        # Process noise covariance (tune as needed)
-        self.Q = np.eye(6) * 0.1
-        # Measurement noise covariance for [x, y, alt]
-        self.R = np.eye(3) * 10.0
-        self.last_time = time.time()
-
-    def predict(self, dt):
-        """Perform the prediction step with time increment dt."""
-        F = np.array([
-            [1, 0, 0, dt, 0,  0],
-            [0, 1, 0, 0,  dt, 0],
-            [0, 0, 1, 0,  0,  dt],
-            [0, 0, 0, 1,  0,  0],
-            [0, 0, 0, 0,  1,  0],
-            [0, 0, 0, 0,  0,  1]
-        ])
-        self.state = F @ self.state
-        self.P = F @ self.P @ F.T + self.Q
-        self.last_time += dt
-        return self.state
-
-    def update(self, lat, lon, alt_m, current_time):
-        """Update the filter with a new measurement (lat, lon in degrees, alt in meters)."""
-        # Convert measurement to local x,y coordinates
-        z_x, z_y = latlon_to_xy(lat, lon, self.ref_lat, self.ref_lon)
-        z_alt = alt_m
-        z = np.array([z_x, z_y, z_alt]).reshape(3, 1)
-
-        # Use the elapsed time since the last update for prediction.
-        dt = current_time - self.last_time
-        if dt > 0:
-            self.predict(dt)
-        H = np.array([
-            [1, 0, 0, 0, 0, 0],
-            [0, 1, 0, 0, 0, 0],
-            [0, 0, 1, 0, 0, 0]
-        ])
-        y = z - (H @ self.state)
-        S = H @ self.P @ H.T + self.R
-        K = self.P @ H.T @ np.linalg.inv(S)
-        self.state = self.state + K @ y
-        self.P = (np.eye(6) - K @ H) @ self.P
-        self.last_time = current_time
+def expire_filters(current_time, quiet):
+    """Drop filters that have had no measurement for FILTER_TIMEOUT seconds."""
+    n = len(rows)
+    stale = np.flatnonzero(current_time - LAST_MEAS[:n] > FILTER_TIMEOUT)
+    # Highest rows first, so the last row moved into a freed slot is never
+    # one that is still waiting to be removed.
+    for row in stale[::-1].tolist():
+        kf = remove_row(row)
+        del filters[kf.icao]
+        if not quiet:
+            print(f"Dropped filter for aircraft {kf.icao}")
+
+def predict_rows(idx, current_time):
+    """Predict the given rows (an index array or slice) forward to current_time."""
+    dt = current_time - LAST_T[idx]
+    moved = dt > 0
+    dt = np.where(moved, dt, 0.0)
+    F = np.empty((len(dt), 6, 6))
+    F[:] = np.eye(6)
+    F[:, 0, 3] = F[:, 1, 4] = F[:, 2, 5] = dt
+    STATE[idx] = np.einsum("nij,nj->ni", F, STATE[idx])
+    P[idx] = F @ P[idx] @ F.transpose(0, 2, 1) + Q * moved[:, None, None]
+    LAST_T[idx] += dt
+
+def predict_all(current_time):
+    """Predict every filter in the store forward to current_time."""
+    n = len(rows)
+    if not n:
+        return
+    if kalman_nb is not None:
+        kalman_nb.predict_all(STATE, P, LAST_T, n, current_time, Q)
+    else:
+        predict_rows(slice(0, n), current_time)
+
+def update_rows(idx, z, current_time):
+    """
+    Update the given rows with measurements z (shape (k, 3): local x, y and
+    altitude in meters). Rows must be unique. A row already predicted past
+    current_time is updated at its own time: LAST_T never goes backwards,
+    or the overlap would be predicted twice.
+    """
+    LAST_MEAS[idx] = current_time
+    if kalman_nb is not None:
+        kalman_nb.update_rows(STATE, P, LAST_T, idx, z, current_time, Q, R)
+        return
+    predict_rows(idx, current_time)
+    Pk = P[idx]
+    PHt = Pk[:, :, :3]                  # P @ H.T
+    HP = Pk[:, :3, :]                   # H @ P
+    S = Pk[:, :3, :3] + R               # H @ P @ H.T + R
+    y = z - STATE[idx, :3]
+    # Solve S against [y | H @ P] in one factorization instead of forming
+    # inv(S): K @ y = PHt @ (S^-1 @ y) and K @ H @ P = PHt @ (S^-1 @ H @ P).
+    W = np.linalg.solve(S, np.concatenate((y[:, :, None], HP), axis=2))
+    STATE[idx] += (PHt @ W[:, :, :1])[:, :, 0]
+    P[idx] = Pk - PHt @ W[:, :, 1:]
 
 # ---------------------------
 # SBS Message Generation from Filter
 # ---------------------------
-def generate_sbs_from_filter(kf, current_time):
+def generate_sbs_from_filter(kf, date_str, time_str):
     """
-    Generate an SBS-formatted CSV line from the predicted state of a KalmanFilterLocal.
-    Uses the current time for the generated/logged timestamps.
+    Generate an SBS-formatted CSV line from the state of a KalmanFilterLocal.
+    The filter is expected to have been predicted forward to now already (see
+    predict_all). date_str ("YYYY/MM/DD") and time_str ("HH:MM:SS") are used
+    for the generated/logged timestamps.
     """
-    # Calculate dt since last update and predict forward to now.
-    dt = current_time - kf.last_time
-    if dt > 0:
-        kf.predict(dt)
-    state = kf.state.flatten()
-    x, y, alt, vx, vy, v_alt = state
+    x, y, alt, vx, vy, v_alt = kf.state.tolist()
 
     # Convert back to lat, lon using the filter's reference.
-    lat, lon = xy_to_latlon(x, y, kf.ref_lat, kf.ref_lon)
+    lat = y / kf._mlat + kf.ref_lat
+    lon = x / kf._mlon + kf.ref_lon
     # Convert altitude from meters to feet.
     alt_ft = int(round(alt * 3.28084))
     # Compute ground speed in m/s from vx, vy and convert to knots.
@@ -129,178 +225,280 @@ def generate_sbs_from_filter(kf, current_time):
     track_deg = int(round(track_deg))
     # Vertical rate: convert v_alt from m/s to ft/min.
     vr_ft_min = int(round(v_alt * 196.850394))
-    
-    # Generate date and time strings.
-    now_struct = time.localtime(current_time)
-    date_str = time.strftime("%Y/%m/%d", now_struct)
-    time_str = time.strftime("%H:%M:%S", now_struct)
-    
-    # SBS fields (22 fields, many left empty or default):
-    fields = [
-        "MSG",                 # Message type
-        "3",                   # Transmission type (3 for airborne position)
-        "",                    # Session ID
-        "",                    # Aircraft ID
-        kf.icao.upper(),       # HexIdent
-        "",                    # Flight ID
-        date_str,              # Date Generated
-        time_str,              # Time Generated
-        date_str,              # Date Logged
-        time_str,              # Time Logged
-        kf.callsign.strip(),   # Callsign
-        str(alt_ft),           # Altitude (ft)
-        str(speed_knots),      # Ground Speed (knots)
-        str(track_deg),        # Track (deg)
-        f"{lat:.5f}",          # Latitude
-        f"{lon:.5f}",          # Longitude
-        str(vr_ft_min),        # Vertical Rate (ft/min)
-        str(kf.squawk),        # Squawk
-        "0",                   # Alert
-        "0",                   # Emergency
-        "0",                   # SPI
-        "0"                    # OnGround
-    ]
-    return ",".join(fields)
+
+    # SBS line (22 fields, many left empty or default):
+    # MSG,3,,,hex_ident,,date,time,date,time,callsign,alt_ft,gs,track,lat,lon,vr,squawk,0,0,0,0
+    # (icao is stored upper-case and callsign stripped by ingest_aircraft.)
+    return (f"MSG,3,,,{kf.icao},,{date_str},{time_str},{date_str},{time_str},"
+            f"{kf.callsign},{alt_ft},{speed_knots},{track_deg},"
+            f"{lat:.5f},{lon:.5f},{vr_ft_min},{kf.squawk},0,0,0,0")
+
+def ingest_aircraft(aircraft, current_time, quiet):
+    """
+    Update or create a Kalman filter for each aircraft record of one UDP
+    packet. Known aircraft are updated together in one batch.
+    """
+    with filters_lock:
+        # Measurements for existing filters, keyed by row so that each
+        # row is updated at most once per packet.
+        measurements = {}
+        for ac in aircraft:
+            # A bad record only skips itself, not the measurements queued
+            # from the rest of the packet.
+            try:
+                icao = ac.get("icaoAddress", "").upper()
+                if not icao:
+                    continue
+                lat = ac.get("latDD")
+                lon = ac.get("lonDD")
+                altitudeMM = ac.get("altitudeMM")
+                if lat is None or lon is None or altitudeMM is None:
+                    continue
+                # Convert altitude from mm to meters.
+                alt_m = float(altitudeMM) / 1000.0
+                callsign = ac.get("callsign", "").strip()
+                squawk = ac.get("squawk", "")
+                kf = filters.get(icao)
+                if kf is not None:
+                    # Queue a measurement for the existing filter.
+                    kf.callsign = callsign  # update if changed
+                    kf.squawk = squawk
+                    measurements[kf.row] = ((lon - kf.ref_lon) * kf._mlon,
+                                            (lat - kf.ref_lat) * kf._mlat,
+                                            alt_m)
+                    continue
+                # Determine initial velocity using horVelocityCMS and headingDE2 if available.
+                v_cm_s = ac.get("horVelocityCMS", 0)
+                speed_mps = float(v_cm_s) / 100.0  # convert cm/s to m/s
+                heading_centi = ac.get("headingDE2", 0)
+                heading_deg = float(heading_centi) / 100.0
+                heading_rad = math.radians(heading_deg)
+                # In our coordinate system: x = east, y = north.
+                vx = speed_mps * math.sin(heading_rad)
+                vy = speed_mps * math.cos(heading_rad)
+                # Vertical velocity in m/s (from verVelocityCMS, cm/s to m/s)
+                v_alt = float(ac.get("verVelocityCMS", 0)) / 100.0
+                # Create a new filter with the current measurement as reference.
+                filters[icao] = add_filter(lat, lon, alt_m, vx, vy, v_alt,
+                                           icao, callsign, squawk, current_time)
+                if not quiet:
+                    print(f"Created filter for aircraft {icao}")
+            except Exception as e:
+                if not quiet:
+                    print(f"Error in aircraft record: {e}")
+        # Update all existing filters seen in this packet in one batch.
+        if measurements:
+            idx = np.fromiter(measurements.keys(), dtype=np.intp, count=len(measurements))
+            z = np.array(list(measurements.values()))
+            update_rows(idx, z, current_time)
 
 # ---------------------------
 # UDP Listener Thread
 # ---------------------------
-def udp_listener(udp_port, quiet):
+def udp_listener(udp_port, quiet, ingest=ingest_aircraft):
     """
-    Listen for incoming UDP JSON messages on the specified port.
-    For each aircraft record, update or create a Kalman filter.
+    Listen for incoming UDP JSON messages on the specified port and pass
+    each packet's aircraft records to ingest (by default, update or create
+    a Kalman filter for each of them in this process).
     """
-    udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    udp_sock.bind(("", udp_port))
+    udp_sock = open_udp_listener(udp_port, quiet)
+    # Datagrams are received in batches into preallocated buffers and parsed
+    # from views of them, instead of one syscall and bytes object per packet.
+    receiver = BatchReceiver(udp_sock)
     if not quiet:
         print(f"UDP listener started on port {udp_port}")
     while True:
         try:
-            data, addr = udp_sock.recvfrom(65535)
-            if not quiet:
-                print(f"Received UDP packet from {addr}")
-            json_str = data.decode("utf-8")
-            json_data = json.loads(json_str)
-            current_time = time.time()
-            if "aircraft" not in json_data:
-                if not quiet:
-                    print("UDP JSON has no 'aircraft' field.")
-                continue
-            with filters_lock:
-                for ac in json_data["aircraft"]:
-                    icao = ac.get("icaoAddress", "").upper()
-                    if not icao:
-                        continue
-                    lat = ac.get("latDD")
-                    lon = ac.get("lonDD")
-                    altitudeMM = ac.get("altitudeMM")
-                    if lat is None or lon is None or altitudeMM is None:
-                        continue
-                    # Convert altitude from mm to meters.
-                    alt_m = float(altitudeMM) / 1000.0
-                    # Determine initial velocity using horVelocityCMS and headingDE2 if available.
-                    v_cm_s = ac.get("horVelocityCMS", 0)
-                    speed_mps = float(v_cm_s) / 100.0  # convert cm/s to m/s
-                    heading_centi = ac.get("headingDE2", 0)
-                    heading_deg = float(heading_centi) / 100.0
-                    heading_rad = math.radians(heading_deg)
-                    # In our coordinate system: x = east, y = north.
-                    vx = speed_mps * math.sin(heading_rad)
-                    vy = speed_mps * math.cos(heading_rad)
-                    # Vertical velocity in m/s (from verVelocityCMS, cm/s to m/s)
-                    v_alt = float(ac.get("verVelocityCMS", 0)) / 100.0
-                    callsign = ac.get("callsign", "").strip()
-                    squawk = ac.get("squawk", "")
-                    # Update or create the filter.
-                    if icao in filters:
-                        # Update existing filter.
-                        filters[icao].callsign = callsign  # update if changed
-                        filters[icao].squawk = squawk
-                        filters[icao].update(lat, lon, alt_m, current_time)
-                    else:
-                        # Create a new filter with the current measurement as reference.
-                        filters[icao] = KalmanFilterLocal(lat, lon, alt_m, vx, vy, v_alt, icao, callsign, squawk)
-                        if not quiet:
-                            print(f"Created filter for aircraft {icao}")
+            packets = receiver.recv()
         except Exception as e:
             if not quiet:
                 print(f"Error in UDP listener: {e}")
+            time.sleep(1)
+            continue
+        for data, addr in packets:
+            try:
+                if not quiet:
+                    print(f"Received UDP packet from {addr}")
+                json_data = json_loads(data)
+                current_time = time.monotonic()
+                if "aircraft" not in json_data:
+                    if not quiet:
+                        print("UDP JSON has no 'aircraft' field.")
+                    continue
+                ingest(json_data["aircraft"], current_time, quiet)
+            except Exception as e:
+                if not quiet:
+                    print(f"Error in UDP listener: {e}")
 
 # ---------------------------
-# Prediction Thread (10 Hz)
+# Prediction Thread (10 Hz by default)
 # ---------------------------
-def prediction_thread(quiet):
+def prediction_thread(quiet, rate=10.0, output=broadcast):
     """
-    At 10 Hz, iterate over all aircraft filters, predict the state,
-    generate an SBS message, and broadcast it to all connected TCP clients.
+    At `rate` Hz, predict all aircraft filters in one batch, generate an SBS
+    message per aircraft, and pass them to output (by default, broadcast
+    them to all connected TCP clients).
+    Ticks are scheduled against monotonic deadlines, so the rate does not
+    drift with the amount of work done per tick.
     """
+    period = 1.0 / rate
+    next_tick = time.monotonic()
+    # SBS date/time strings, formatted once per wall-clock second.
+    cached_sec = None
+    date_str = time_str = ""
     while True:
-        current_time = time.time()
+        # Filters are timed with the monotonic clock; wall-clock time is only
+        # used for the SBS date/time strings.
+        current_time = time.monotonic()
+        sec = int(time.time())
+        if sec != cached_sec:
+            cached_sec = sec
+            now_struct = time.localtime(sec)
+            date_str = time.strftime("%Y/%m/%d", now_struct)
+            time_str = time.strftime("%H:%M:%S", now_struct)
         messages = []
         with filters_lock:
-            for icao, kf in list(filters.items()):
+            expire_filters(current_time, quiet)
+            predict_all(current_time)
+            fresh = (current_time - LAST_MEAS[:len(rows)] <= OUTPUT_TIMEOUT).tolist()
+            for kf, is_fresh in zip(rows, fresh):
+                if not is_fresh:
+                    continue
                 try:
-                    sbs_msg = generate_sbs_from_filter(kf, current_time)
+                    sbs_msg = generate_sbs_from_filter(kf, date_str, time_str)
                     messages.append(sbs_msg + "\n")
                 except Exception as e:
                     if not quiet:
-                        print(f"Error generating SBS for {icao}: {e}")
-        # Broadcast all messages (if any)
+                        print(f"Error generating SBS for {kf.icao}: {e}")
+        # Broadcast all messages (if any), encoded once for all clients.
         if messages:
-            broadcast("".join(messages), quiet)
-        time.sleep(0.1)
+            output("".join(messages).encode("utf-8"), quiet)
+        next_tick += period
+        slack = next_tick - time.monotonic()
+        if slack > 0:
+            time.sleep(slack)
+        else:
+            # Overran the tick: start a fresh schedule instead of bursting.
+            next_tick = time.monotonic()
 
 # ---------------------------
-# TCP Server for SBS Output
+# Worker Processes (--workers)
 # ---------------------------
-def broadcast(message, quiet):
+def shard_worker(conn, output, quiet, rate):
     """
-    Send the given message (string) to all connected TCP clients.
-    Remove clients that are disconnected.
+    Worker process: run the Kalman filters of one shard of the aircraft.
+    Aircraft records arrive from the master over conn; each tick's SBS
+    payload is sent back over output for the master to broadcast.
     """
-    global clients
-    with clients_lock:
-        for client in clients[:]:
+    def send_output(payload, quiet):
+        output.send_bytes(payload)
+
+    pred_thread = threading.Thread(target=prediction_thread,
+                                   args=(quiet, rate, send_output), daemon=True)
+    pred_thread.start()
+    while True:
+        try:
+            aircraft, current_time = conn.recv()
+        except EOFError:
+            return  # The master is gone.
+        try:
+            ingest_aircraft(aircraft, current_time, quiet)
+        except Exception as e:
+            if not quiet:
+                print(f"Error in worker: {e}")
+
+class WorkerPool:
+    """
+    Worker processes that each own the filters of a disjoint shard of the
+    aircraft, chosen by ICAO address. A worker that dies is restarted with
+    an empty shard, which refills from the following packets.
+    """
+
+    def __init__(self, count, quiet, rate):
+        self.quiet = quiet
+        self.rate = rate
+        # Workers are started from a fork server (or spawned), never forked
+        # from this process directly: restarts happen once it has threads,
+        # and a worker then holds no copies of its siblings' pipe ends, so
+        # each side sees EOF as soon as the other exits.
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.ctx = multiprocessing.get_context(method)
+        # Held while sending to the workers, and while replacing one.
+        self.lock = threading.Lock()
+        self.workers = [self._start() for _ in range(count)]
+
+    def _start(self):
+        """Start a worker; returns (process, input conn, output conn)."""
+        in_recv, in_send = self.ctx.Pipe(duplex=False)
+        out_recv, out_send = self.ctx.Pipe(duplex=False)
+        proc = self.ctx.Process(target=shard_worker,
+                                args=(in_recv, out_send, self.quiet, self.rate), daemon=True)
+        proc.start()
+        # The worker's ends now live in the worker.
+        in_recv.close()
+        out_send.close()
+        return proc, in_send, out_recv
+
+    def dispatch(self, aircraft, current_time, quiet):
+        """Ingest function for udp_listener(): send each record to its shard."""
+        count = len(self.workers)
+        shards = [[] for _ in range(count)]
+        for ac in aircraft:
             try:
-                client.sendall(message.encode("utf-8"))
+                icao = ac.get("icaoAddress", "").upper()
             except Exception as e:
+                # Skip just this record; the workers log their own errors.
                 if not quiet:
-                    print(f"Removing client due to error: {e}")
-                clients.remove(client)
+                    print(f"Error in aircraft record: {e}")
+                continue
+            if icao:
+                shards[hash(icao) % count].append(ac)
+        with self.lock:
+            for (proc, in_send, out_recv), shard in zip(self.workers, shards):
+                if not shard:
+                    continue
                 try:
-                    client.close()
-                except:
+                    in_send.send((shard, current_time))
+                except OSError:
+                    # The worker died; forward_output() restarts it. Its
+                    # records are dropped until then, the others still go out.
                     pass
 
-def tcp_server(listen_host, listen_port, quiet):
-    """
-    Start a TCP server that listens on the specified host and port.
-    Accept incoming client connections and add them to the global client list.
-    """
-    server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server_sock.bind((listen_host, listen_port))
-    server_sock.listen(5)
-    if not quiet:
-        print(f"TCP server listening on {listen_host or '0.0.0.0'}:{listen_port}")
-    while True:
-        try:
-            client_sock, client_addr = server_sock.accept()
-            with clients_lock:
-                clients.append(client_sock)
-            if not quiet:
-                print(f"New client connected from {client_addr}")
-        except Exception as e:
-            if not quiet:
-                print(f"Error accepting client connection: {e}")
-            time.sleep(1)
+    def forward_output(self):
+        """
+        Broadcast the SBS payloads the workers send to the TCP clients,
+        restarting any worker whose output pipe closes.
+        """
+        while True:
+            with self.lock:
+                outputs = {worker[2]: i for i, worker in enumerate(self.workers)}
+            for conn in wait(list(outputs)):
+                try:
+                    payload = conn.recv_bytes()
+                except (EOFError, OSError):
+                    self._restart(outputs[conn])
+                    continue
+                broadcast(payload, self.quiet)
+
+    def _restart(self, i):
+        """Replace worker i, whose output pipe has closed."""
+        proc, in_send, out_recv = self.workers[i]
+        proc.terminate()
+        proc.join()
+        if not self.quiet:
+            print(f"Worker {i} exited (exit code {proc.exitcode}); restarting it")
+        new_worker = self._start()
+        with self.lock:
+            self.workers[i] = new_worker
+        in_send.close()
+        out_recv.close()
 
 # ---------------------------
 # Main
 # ---------------------------
 def main():
     parser = argparse.ArgumentParser(
-        description="UDP-to-TCP SBS server with Kalman filter prediction (10 Hz updates)."
+        description="UDP-to-TCP SBS server with Kalman filter prediction (10 Hz updates by default)."
     )
     parser.add_argument("--udp-port", "-u", type=int, default=6666,
                         help="UDP port for incoming JSON data (default: 6666)")
@@ -308,18 +506,42 @@ def main():
                         help="TCP port for SBS output to clients (default: 30103)")
     parser.add_argument("--listen-host", "-l", default="",
                         help="TCP listen address (default: all interfaces)")
+    parser.add_argument("--rate", "-r", type=float, default=10.0,
+                        help="SBS prediction output rate in Hz (default: 10)")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+                        help="Worker processes to shard the aircraft filters across "
+                             "(default: 1, all in this process)")
     parser.add_argument("--quiet", action="store_true",
                         help="Run in quiet mode with no console output")
     args = parser.parse_args()
     quiet = args.quiet
+    if not (args.rate > 0 and math.isfinite(args.rate)):
+        parser.error("--rate must be a positive number of Hz")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.workers > 1:
+        # This process then only receives, parses and dispatches UDP packets
+        # and serves the TCP clients; filter math and SBS formatting run in
+        # parallel in the workers.
+        pool = WorkerPool(args.workers, quiet, args.rate)
+        ingest = pool.dispatch
+        output_thread = threading.Thread(target=pool.forward_output, daemon=True)
+        output_thread.start()
+    else:
+        ingest = ingest_aircraft
+        # Start prediction thread.
+        pred_thread = threading.Thread(target=prediction_thread, args=(quiet, args.rate), daemon=True)
+        pred_thread.start()
 
     # Start UDP listener thread.
-    udp_thread = threading.Thread(target=udp_listener, args=(args.udp_port, quiet), daemon=True)
+    udp_thread = threading.Thread(target=udp_listener, args=(args.udp_port, quiet, ingest),
+                                  daemon=True)
     udp_thread.start()
 
-    # Start prediction thread.
-    pred_thread = threading.Thread(target=prediction_thread, args=(quiet,), daemon=True)
-    pred_thread.start()
+    # Start the TCP client writer thread.
+    writer_thread = threading.Thread(target=client_writer, args=(quiet,), daemon=True)
+    writer_thread.start()
 
     # Start TCP server (runs in main thread).
     tcp_server(args.listen_host, args.tcp_port, quiet)
@@ -0,0 +1,133 @@
+"""
+UDP socket setup and batched receive for the udp_json_to_sbs*.py listeners.
+
+open_udp_listener creates the listening socket with a large receive buffer
+and SO_REUSEPORT. BatchReceiver uses Linux recvmmsg(2) through ctypes to receive up to `batch`
+datagrams per system call into preallocated buffers. Where recvmmsg is not
+available it falls back to one recvfrom_into per call.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+import struct
+import sys
+
+MSG_WAITFORONE = 0x10000
+SOCKADDR_SIZE = 128  # sizeof(struct sockaddr_storage)
+
+# Requested kernel receive buffer for UDP listeners, to ride out bursts.
+# Linux caps it at net.core.rmem_max (about 208 KiB by default); raise that
+# with `sysctl -w net.core.rmem_max=16777216` to get the full size.
+UDP_RCVBUF = 16 * 1024 * 1024
+
+def open_udp_listener(port, quiet=False):
+    """
+    Create a UDP socket bound to port on all interfaces.
+
+    SO_REUSEPORT lets several listener processes bind the same port; the
+    kernel then spreads datagrams across them by source address and port.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RCVBUF)
+    granted = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    if sys.platform.startswith("linux"):
+        granted //= 2  # Linux reports double the size, to cover bookkeeping.
+    if granted < UDP_RCVBUF and not quiet:
+        print(f"UDP receive buffer capped at {granted} bytes; "
+              f"raise net.core.rmem_max to allow {UDP_RCVBUF}")
+    sock.bind(("", port))
+    return sock
+
+class iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p),
+                ("iov_len", ctypes.c_size_t)]
+
+class msghdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p),
+                ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(iovec)),
+                ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p),
+                ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", msghdr),
+                ("msg_len", ctypes.c_uint)]
+
+def _load_recvmmsg():
+    """Return libc's recvmmsg, or None if it isn't available."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        recvmmsg = libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(mmsghdr), ctypes.c_uint,
+                         ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+    return recvmmsg
+
+_recvmmsg = _load_recvmmsg()
+
+def _parse_sockaddr(raw):
+    """Convert a raw struct sockaddr_in to an (ip, port) tuple like recvfrom."""
+    family = struct.unpack_from("=H", raw)[0]
+    if family != socket.AF_INET:
+        return None
+    port = struct.unpack_from("!H", raw, 2)[0]
+    return socket.inet_ntoa(raw[4:8]), port
+
+class BatchReceiver:
+    """
+    Receive datagrams from a blocking UDP socket in batches.
+
+    recv() blocks until at least one datagram is available and returns a list
+    of (data, addr) pairs, where data is a memoryview into a buffer owned by
+    the receiver. The views are only valid until the next call to recv().
+    """
+
+    def __init__(self, sock, batch=64, bufsize=65535):
+        self.sock = sock
+        self.fd = sock.fileno()
+        # One pinned buffer per slot, kept alive across calls.
+        self.bufs = [bytearray(bufsize) for _ in range(batch if _recvmmsg else 1)]
+        self.views = [memoryview(b) for b in self.bufs]
+        if _recvmmsg is None:
+            return
+        self.names = ctypes.create_string_buffer(SOCKADDR_SIZE * batch)
+        self.iovecs = (iovec * batch)()
+        self.msgs = (mmsghdr * batch)()
+        self.names_addr = ctypes.addressof(self.names)
+        self.pins = [(ctypes.c_char * bufsize).from_buffer(b) for b in self.bufs]
+        for i, pin in enumerate(self.pins):
+            self.iovecs[i].iov_base = ctypes.addressof(pin)
+            self.iovecs[i].iov_len = bufsize
+            hdr = self.msgs[i].msg_hdr
+            hdr.msg_name = self.names_addr + i * SOCKADDR_SIZE
+            hdr.msg_iov = ctypes.pointer(self.iovecs[i])
+            hdr.msg_iovlen = 1
+            hdr.msg_namelen = SOCKADDR_SIZE
+
+    def recv(self):
+        if _recvmmsg is None:
+            nbytes, addr = self.sock.recvfrom_into(self.bufs[0])
+            return [(self.views[0][:nbytes], addr)]
+        while True:
+            count = _recvmmsg(self.fd, self.msgs, len(self.msgs), MSG_WAITFORONE, None)
+            if count >= 0:
+                break
+            err = ctypes.get_errno()
+            if err != errno.EINTR:
+                raise OSError(err, os.strerror(err))
+        packets = []
+        for i in range(count):
+            msg = self.msgs[i]
+            addr = _parse_sockaddr(ctypes.string_at(self.names_addr + i * SOCKADDR_SIZE, 8))
+            packets.append((self.views[i][:msg.msg_len], addr))
+            # The kernel overwrote msg_namelen; reset it for the next call.
+            msg.msg_hdr.msg_namelen = SOCKADDR_SIZE
+        return packets